@@ -1,13 +1,28 @@
 import streamlit as st
 import boto3
-from botocore.exceptions import ClientError
-from io import BytesIO
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectTimeoutError, ReadTimeoutError
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError as SocketReadTimeoutError
+from urllib3.util import Retry
 import json
-from datetime import datetime
+import html
+import orjson
+import codecs
+import concurrent.futures
+import random
 import time
+import threading
 import os
-import uuid
-from typing import List, Dict, Any
+import hashlib
+import secrets
+from collections import OrderedDict, deque
+from typing import List, Dict, Any, BinaryIO, Callable, Iterator, Optional, Tuple
 
 # Page configuration
 st.set_page_config(
@@ -18,7 +33,7 @@ st.set_page_config(
 )
 
 # Custom CSS for better styling
-st.markdown("""
+_CSS = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -33,35 +48,6 @@ st.markdown("""
         text-align: center;
         margin-bottom: 2rem;
     }
-    .upload-section {
-        background-color: #f8f9fa;
-        padding: 1.5rem;
-        border-radius: 10px;
-        border: 2px dashed #dee2e6;
-        margin-bottom: 2rem;
-    }
-    .file-list {
-        background-color: #e8f4fd;
-        padding: 1rem;
-        border-radius: 8px;
-        margin-top: 1rem;
-    }
-    .chat-message {
-        padding: 1rem;
-        margin: 0.5rem 0;
-        border-radius: 10px;
-    }
-    .user-message {
-        background-color: #007bff;
-        color: white;
-        margin-left: 20%;
-    }
-    .ai-message {
-        background-color: #f8f9fa;
-        border: 1px solid #dee2e6;
-        margin-right: 20%;
-        color: #212529;
-    }
     .document-snippet {
         background-color: #fff3cd;
         border: 1px solid #ffeaa7;
@@ -70,69 +56,41 @@ st.markdown("""
         margin: 0.5rem 0;
         font-style: italic;
     }
-    .error-message {
-        background-color: #f8d7da;
-        color: #721c24;
-        padding: 1rem;
-        border-radius: 5px;
-        border: 1px solid #f5c6cb;
-    }
-    .success-message {
-        background-color: #d4edda;
-        color: #155724;
-        padding: 1rem;
-        border-radius: 5px;
-        border: 1px solid #c3e6cb;
-    }
-    .success-banner {
-        background-color: #27ae60;
-        color: white;
-        padding: 1rem;
-        border-radius: 8px;
-        margin: 1rem 0;
-        text-align: center;
-    }
-    .info-banner {
-        background-color: #3498db;
-        color: white;
-        padding: 1rem;
-        border-radius: 8px;
-        margin: 1rem 0;
-        text-align: center;
-    }
-    .unified-chat-container {
-        max-height: 600px;
-        overflow-y: auto;
-        padding: 1rem;
-        background-color: #f8f9fa;
-        border-radius: 8px;
-        border: 1px solid #dee2e6;
-        margin-bottom: 1rem;
-        display: flex;
-        flex-direction: column;
-    }
-    .chat-messages {
-        flex: 1;
-        overflow-y: auto;
-    }
-    .chat-input-section {
-        background-color: #ffffff;
-        border-top: 1px solid #dee2e6;
-        padding: 1rem;
-        border-radius: 0 0 8px 8px;
-        margin-top: 1rem;
-    }
-    .message-timestamp {
-        font-size: 0.8rem;
-        opacity: 0.7;
-        margin-bottom: 0.5rem;
-    }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Page header and footer markup
+HEADER_HTML = '<h1 class="main-header">📚 Internal Document Search Chatbot</h1>'
+SUBHEADER_HTML = '<p class="sub-header">Upload your internal documents and ask questions using natural language</p>'
+FOOTER_HTML = """
+<div style='text-align: center; color: #666; padding: 1rem;'>
+    <p>🔧 Internal Document Search Chatbot | Built with Streamlit</p>
+    <p>For manufacturing employees to easily search guidelines, manuals, and policies</p>
+</div>
+"""
+
+def _inject_css():
+    """Inject the custom stylesheet without going through the markdown parser"""
+    st.html(_CSS)
+
+def _env_seconds(name: str, default: float, warnings: List[str]) -> float:
+    """Read a positive number of seconds from the environment, falling back to the default"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        seconds = float(value)
+        if seconds > 0:
+            return seconds
+    except ValueError:
+        pass
+    warnings.append(f"{name}={value!r} is not a positive number of seconds; using {default}.")
+    return default
 
 # Configuration - Load from environment variables
+@st.cache_resource(show_spinner=False)
 def load_config():
-    """Load configuration from environment variables"""
+    """Load configuration from environment variables once per process"""
     # Try to load from .env file if in development
     try:
         from dotenv import load_dotenv
@@ -141,68 +99,223 @@ def load_config():
         # dotenv not available in production, use system env vars
         pass
     
+    warnings = []
     config = {
         'S3_BUCKET': os.getenv('S3_BUCKET_NAME', 'cacheme-documents'),
         'S3_REGION': os.getenv('AWS_REGION', 'ap-southeast-5'),  # Malaysia region
         'QUERY_LAMBDA_ARN': os.getenv('QUERY_LAMBDA_ARN', 'arn:aws:lambda:ap-southeast-5:904331954830:function:cacheme-query'),
         'AWS_ACCESS_KEY_ID': os.getenv('AWS_ACCESS_KEY_ID'),
         'AWS_SECRET_ACCESS_KEY': os.getenv('AWS_SECRET_ACCESS_KEY'),
-        'OPENSEARCH_ENDPOINT': os.getenv('OPENSEARCH_ENDPOINT')
+        'OPENSEARCH_ENDPOINT': os.getenv('OPENSEARCH_ENDPOINT'),
+        'INGEST_LAMBDA_ARN': os.getenv('INGEST_LAMBDA_ARN'),
+        'QUERY_FUNCTION_URL': os.getenv('QUERY_FUNCTION_URL'),
+        # Only enable once the query function returns early for {"warmup": true} events
+        'QUERY_WARMUP': os.getenv('QUERY_WARMUP', '').lower() in ('1', 'true', 'yes'),
+        # Seconds to wait for a connection and between response chunks from the query function URL
+        'CHAT_CONNECT_TIMEOUT': _env_seconds('CHAT_CONNECT_TIMEOUT', 3.05, warnings),
+        'CHAT_READ_TIMEOUT': _env_seconds('CHAT_READ_TIMEOUT', 10, warnings),
+        # Problems found while reading the settings, shown in the sidebar
+        'CONFIG_WARNINGS': warnings
     }
     return config
 
-# Initialize AWS clients
+# Shared botocore settings - keep HTTPS connections alive across reruns
+AWS_CLIENT_CONFIG = Config(
+    retries={'total_max_attempts': 3, 'mode': 'standard'},
+    tcp_keepalive=True,
+    max_pool_connections=50
+)
+# Lambda calls are retried by stream_chat_message only, so throttled calls are not
+# multiplied; adaptive mode still adds client-side rate limiting under throttling
+LAMBDA_CLIENT_CONFIG = AWS_CLIENT_CONFIG.merge(Config(
+    retries={'total_max_attempts': 1, 'mode': 'adaptive'},
+    read_timeout=30,
+    connect_timeout=5
+))
+
+# Multipart settings for document uploads - 8 MiB parts sent in parallel
+UPLOAD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True
+)
+# Files above LARGE_UPLOAD_BYTES get twice the parallel parts
+LARGE_UPLOAD_BYTES = 64 * 1024 * 1024
+LARGE_UPLOAD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=16,
+    use_threads=True
+)
+
+class QueryFunctionError(Exception):
+    """The Query Lambda reported a failure while producing its response"""
+    
+    def __init__(self, message: str, retryable: bool = False, credentials_rejected: bool = False):
+        super().__init__(message)
+        # True for throttling and transient failures a fresh attempt may get past
+        self.retryable = retryable
+        # True when the request was refused because of the AWS credentials it was signed with
+        self.credentials_rejected = credentials_rejected
+
+# Maximum number of chat messages kept in a session
+CHAT_HISTORY_LIMIT = 200
+
+# Chat message templates - messages are plain markdown, snippet placeholders take escaped text
+CAPTION_TMPL = ":small[:gray[{author} • {timestamp}]]"
+MESSAGE_TMPL = "{caption}\n\n{content}"
+SNIPPETS_HEADER = "**📄 Relevant Document Snippets:**\n\n"
+SNIPPET_TMPL = '<div class="document-snippet"><strong>From:</strong> {source}<br>{text}</div>'
+
+# Largest PDF accepted by the browser-side direct upload
+DIRECT_UPLOAD_MAX_BYTES = 5 * 1024 * 1024 * 1024
+
+# Browser-side uploader posting the file to a presigned S3 form (__POST__ is filled in)
+DIRECT_UPLOAD_HTML = """
+<div style="font-family: sans-serif; font-size: 0.9rem;">
+    <input type="file" id="file" accept="application/pdf">
+    <button id="send">Upload</button>
+    <div id="status" style="margin-top: 0.5rem; color: #666;"></div>
+</div>
+<script>
+    const post = __POST__;
+    const status = document.getElementById("status");
+    document.getElementById("send").onclick = () => {
+        const file = document.getElementById("file").files[0];
+        if (!file) { status.textContent = "Choose a PDF first."; return; }
+        const form = new FormData();
+        Object.entries(post.fields).forEach(([name, value]) => form.append(name, value));
+        form.append("file", file);
+        status.textContent = "Uploading " + file.name + "...";
+        fetch(post.url, {method: "POST", body: form})
+            .then(r => { status.textContent = r.ok ? "✅ Uploaded " + file.name + " - click Register upload to start ingestion" : "❌ Upload failed (HTTP " + r.status + ")"; })
+            .catch(e => { status.textContent = "❌ Upload failed: " + e; });
+    };
+</script>
+"""
+
+# Lambda error codes worth another attempt from stream_chat_message
+RETRYABLE_LAMBDA_ERRORS = frozenset({'ThrottlingException', 'TooManyRequestsException', 'ServiceUnavailableException'})
+
+# User-facing messages for Lambda error codes that retrying cannot fix
+LAMBDA_ERROR_MESSAGES = {
+    'UnrecognizedClientException': "Invalid AWS credentials. Please check your AWS access key and secret key.",
+    'AccessDeniedException': "Access denied. Please check your AWS IAM permissions."
+}
+
+@st.cache_resource(show_spinner=False)
+def _aws_session(region: str, access_key_id: Optional[str], secret_access_key: Optional[str]):
+    """Create the boto3 session once per worker for a region and credential pair"""
+    # Will use IAM roles if available, otherwise use access keys
+    session_kwargs = {'region_name': region}
+    
+    if access_key_id and secret_access_key:
+        session_kwargs.update({
+            'aws_access_key_id': access_key_id,
+            'aws_secret_access_key': secret_access_key
+        })
+    
+    return boto3.Session(**session_kwargs)
+
+@st.cache_resource(show_spinner=False)
+def _aws_clients(region: str, access_key_id: Optional[str], secret_access_key: Optional[str]):
+    """Create the S3 and Lambda clients once per worker"""
+    session = _aws_session(region, access_key_id, secret_access_key)
+    return session.client('s3', config=AWS_CLIENT_CONFIG), session.client('lambda', config=LAMBDA_CLIENT_CONFIG)
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _probe_aws(region: str, access_key_id: Optional[str], secret_access_key: Optional[str]):
+    """Check the AWS identity at most every 10 minutes"""
+    try:
+        sts_client = _aws_session(region, access_key_id, secret_access_key).client('sts')
+        identity = sts_client.get_caller_identity()
+        return True, f"Connected to AWS Account: {identity['Account']}"
+    except Exception as e:
+        return False, f"AWS connection failed: {str(e)}"
+
+# S3 error codes meaning the cached session holds stale or bad credentials
+S3_AUTH_ERRORS = ('InvalidAccessKeyId', 'SignatureDoesNotMatch', 'ExpiredToken')
+
+def _reset_aws():
+    """Drop the cached config, session, clients and probe so the next run rebuilds them"""
+    for cached in (load_config, _aws_session, _aws_clients, _probe_aws):
+        cached.clear()
+
+@st.cache_resource
+def _pool():
+    """Shared worker threads for blocking AWS calls"""
+    return concurrent.futures.ThreadPoolExecutor(max_workers=8)
+
 @st.cache_resource
+def get_http_session():
+    """Keep-alive HTTP session for the query function URL"""
+    session = requests.Session()
+    # Only connection failures are retried here; stream_chat_message owns throttle and 5xx retries
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                          max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.3))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+# Initialize AWS clients
 def initialize_aws_clients():
     """Initialize AWS clients with caching"""
     config = load_config()
+    credentials = (config['S3_REGION'], config['AWS_ACCESS_KEY_ID'], config['AWS_SECRET_ACCESS_KEY'])
     
     try:
-        # Create AWS session - will use IAM roles if available, otherwise use access keys
-        session_kwargs = {'region_name': config['S3_REGION']}
-        
-        if config['AWS_ACCESS_KEY_ID'] and config['AWS_SECRET_ACCESS_KEY']:
-            session_kwargs.update({
-                'aws_access_key_id': config['AWS_ACCESS_KEY_ID'],
-                'aws_secret_access_key': config['AWS_SECRET_ACCESS_KEY']
-            })
-        
-        session = boto3.Session(**session_kwargs)
-        
-        # Initialize clients
-        s3_client = session.client('s3')
-        lambda_client = session.client('lambda')
-        
-        # Test connection
-        try:
-            sts_client = session.client('sts')
-            identity = sts_client.get_caller_identity()
-            return s3_client, lambda_client, config, True, f"Connected to AWS Account: {identity['Account']}"
-        except Exception as e:
-            return None, None, config, False, f"AWS connection failed: {str(e)}"
-            
+        s3_client, lambda_client = _aws_clients(*credentials)
     except Exception as e:
         return None, None, config, False, f"Failed to initialize AWS clients: {str(e)}"
+    
+    # Test connection
+    connected, status = _probe_aws(*credentials)
+    if not connected:
+        return None, None, config, False, status
+    return s3_client, lambda_client, config, True, status
 
 # Initialize session state
 def initialize_session_state():
     """Initialize session state variables"""
+    # Only the most recent messages are kept so each rerun renders a bounded window
     if 'chat_history' not in st.session_state:
-        st.session_state.chat_history = []
+        st.session_state.chat_history = deque(maxlen=CHAT_HISTORY_LIMIT)
+    # Files uploaded this session, keyed by S3 key
     if 'uploaded_files' not in st.session_state:
-        st.session_state.uploaded_files = []
+        st.session_state.uploaded_files = {}
+    # Upload results keyed by content digest
     if 'upload_status' not in st.session_state:
         st.session_state.upload_status = {}
 
-def upload_file_to_s3(file_content: bytes, filename: str, s3_client, config: dict) -> Dict[str, Any]:
+def _content_digest(file_obj: BinaryIO) -> str:
+    """Hash a file's contents in chunks without loading it all into memory"""
+    digest = hashlib.blake2b(digest_size=16)
+    file_obj.seek(0)
+    for chunk in iter(lambda: file_obj.read(1024 * 1024), b''):
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+def _looks_like_pdf(head: bytes) -> bool:
+    """Check the first KiB of a file for the PDF signature; readers accept a short preamble before it"""
+    return b'%PDF-' in head[:1024]
+
+def upload_file_to_s3(file_obj: BinaryIO, filename: str, s3_client, config: dict,
+                      progress_callback: Optional[Callable[[int], None]] = None,
+                      digest: Optional[str] = None) -> Dict[str, Any]:
     """
     Upload file directly to S3 and trigger ingestion
     
+    The file is streamed in multipart chunks rather than copied into memory.
+    
     Args:
-        file_content: File content as bytes
+        file_obj: Readable file object, e.g. a Streamlit UploadedFile
         filename: Name of the file
         s3_client: Initialized S3 client
         config: Configuration dictionary
+        progress_callback: Called from the transfer threads with each chunk's byte count
+        digest: Precomputed _content_digest of the file, hashed here if omitted
         
     Returns:
         Response status
@@ -210,177 +323,655 @@ def upload_file_to_s3(file_content: bytes, filename: str, s3_client, config: dic
     if s3_client is None:
         return {"success": False, "error": "S3 client not initialized. Please check your AWS credentials."}
     
+    # Reject files that are not PDFs before spending bandwidth on them
+    file_obj.seek(0)
+    is_pdf = _looks_like_pdf(file_obj.read(1024))
+    file_obj.seek(0)
+    if not is_pdf:
+        return {"success": False, "error": f"'{filename}' is not a valid PDF file."}
+    
     try:
-        # Generate a unique S3 key for the file
-        s3_key = f"uploads/{uuid.uuid4()}_{filename}"
+        # Key the file on its content so re-uploads of the same PDF map to one object
+        s3_key = f"uploads/{digest or _content_digest(file_obj)}_{filename}"
+        
+        # Skip the upload (and re-ingestion) if this exact file is already in S3
+        try:
+            s3_client.head_object(Bucket=config['S3_BUCKET'], Key=s3_key)
+            return {
+                "success": True,
+                "data": {
+                    "s3_key": s3_key,
+                    "bucket": config['S3_BUCKET'],
+                    "filename": filename,
+                    "existing": True
+                }
+            }
+        except ClientError:
+            # Not uploaded yet (or not readable) - fall through to the upload
+            pass
         
         # Upload to S3
+        size = file_obj.seek(0, os.SEEK_END)
+        file_obj.seek(0)
         s3_client.upload_fileobj(
-            BytesIO(file_content), 
+            file_obj, 
             config['S3_BUCKET'], 
             s3_key, 
+            Config=LARGE_UPLOAD_TRANSFER_CONFIG if size > LARGE_UPLOAD_BYTES else UPLOAD_TRANSFER_CONFIG,
+            Callback=progress_callback,
             ExtraArgs={
                 'ContentType': 'application/pdf',
                 'Metadata': {
                     'filename': filename,
-                    'upload_time': datetime.now().isoformat()
+                    'upload_time': time.strftime("%Y-%m-%dT%H:%M:%S")
                 }
             }
         )
         
-        # Wait briefly to ensure S3 consistency
-        time.sleep(1)
-        
         return {
             "success": True, 
             "data": {
                 "s3_key": s3_key,
                 "bucket": config['S3_BUCKET'],
-                "filename": filename
+                "filename": filename,
+                "existing": False
             }
         }
-    except ClientError as e:
+    except (ClientError, S3UploadFailedError) as e:
         error_msg = str(e)
-        if 'AccessDenied' in error_msg:
+        if any(code in error_msg for code in S3_AUTH_ERRORS):
+            _reset_aws()
+            return {"success": False, "error": "AWS credentials were rejected by S3. Please check your AWS access key and secret key."}
+        elif 'AccessDenied' in error_msg:
             return {"success": False, "error": "Access denied to S3. Please check your AWS credentials and permissions."}
         elif 'NoSuchBucket' in error_msg:
             return {"success": False, "error": f"S3 bucket '{config['S3_BUCKET']}' not found. Please check your configuration."}
         else:
             return {"success": False, "error": f"S3 upload failed: {error_msg}"}
 
-def send_chat_message(message: str, lambda_client, config: dict, max_retries: int = 3) -> Dict[str, Any]:
+def create_presigned_upload(s3_client, config: dict, expires_in: int = 900) -> Dict[str, Any]:
+    """
+    Create a presigned POST that lets the browser upload a PDF straight to S3
+    
+    The key keeps S3's ${filename} placeholder, so one policy serves any file
+    the user picks. Signing is local, no request is sent to AWS.
+    
+    Args:
+        s3_client: Initialized S3 client
+        config: Configuration dictionary
+        expires_in: Seconds the upload form stays valid
+        
+    Returns:
+        Response status with the POST url and form fields
+    """
+    if s3_client is None:
+        return {"success": False, "error": "S3 client not initialized. Please check your AWS credentials."}
+    
+    try:
+        post = s3_client.generate_presigned_post(
+            Bucket=config['S3_BUCKET'],
+            Key=f"uploads/{secrets.token_hex(8)}_${{filename}}",
+            Fields={'Content-Type': 'application/pdf'},
+            Conditions=[
+                {'Content-Type': 'application/pdf'},
+                ['content-length-range', 1, DIRECT_UPLOAD_MAX_BYTES]
+            ],
+            ExpiresIn=expires_in
+        )
+        return {"success": True, "data": post}
+    except ClientError as e:
+        return {"success": False, "error": f"Could not prepare direct upload: {str(e)}"}
+
+def direct_upload_widget(s3_client, config: dict):
+    """Render a browser-side uploader that sends the PDF to S3 without passing through this server"""
+    # Reuse the form until shortly before it expires so reruns do not reload the widget mid-upload
+    cached = st.session_state.get('direct_upload')
+    if cached is None or cached[0] < time.time() + 60:
+        result = create_presigned_upload(s3_client, config)
+        if not result["success"]:
+            st.error(f"❌ {result['error']}")
+            return
+        cached = (time.time() + 900, result["data"])
+        st.session_state.direct_upload = cached
+    
+    # Remember every key prefix handed out so register_direct_uploads can find the files
+    prefix = cached[1]['fields']['key'].split('${filename}')[0]
+    st.session_state.setdefault('direct_upload_prefixes', [])
+    if prefix not in st.session_state.direct_upload_prefixes:
+        st.session_state.direct_upload_prefixes.append(prefix)
+    
+    post_json = orjson.dumps(cached[1]).decode('utf-8').replace('</', '<\\/')
+    widget_html = DIRECT_UPLOAD_HTML.replace('__POST__', post_json)
+    st.iframe(widget_html, height=110)
+
+def register_direct_uploads(s3_client, config: dict, prefixes: List[str], known_keys) -> Dict[str, Any]:
+    """
+    Confirm files the browser uploaded under the given key prefixes
+    
+    Each new object has its first KiB checked for the PDF signature. Objects
+    that are not PDFs are deleted so they are never ingested.
+    
+    Args:
+        s3_client: Initialized S3 client
+        config: Configuration dictionary
+        prefixes: Key prefixes of the presigned forms issued to this session
+        known_keys: S3 keys already registered, which are skipped
+        
+    Returns:
+        Response status with the registered PDFs and the rejected filenames
+    """
+    if s3_client is None:
+        return {"success": False, "error": "S3 client not initialized. Please check your AWS credentials."}
+    
+    registered = []
+    rejected = []
+    try:
+        for prefix in prefixes:
+            listing = s3_client.list_objects_v2(Bucket=config['S3_BUCKET'], Prefix=prefix)
+            for obj in listing.get('Contents', []):
+                s3_key = obj['Key']
+                if s3_key in known_keys:
+                    continue
+                
+                filename = s3_key[len(prefix):]
+                head = s3_client.get_object(Bucket=config['S3_BUCKET'], Key=s3_key, Range='bytes=0-1023')['Body'].read()
+                if not _looks_like_pdf(head):
+                    s3_client.delete_object(Bucket=config['S3_BUCKET'], Key=s3_key)
+                    rejected.append(filename)
+                    continue
+                
+                registered.append({"s3_key": s3_key, "filename": filename, "size": obj['Size']})
+        
+        return {"success": True, "data": {"registered": registered, "rejected": rejected}}
+    except ClientError as e:
+        return {"success": False, "error": f"Could not register direct uploads: {str(e)}"}
+
+def trigger_ingestion(s3_key: str, lambda_client, config: dict) -> bool:
+    """
+    Start the ingestion Lambda for an uploaded document without waiting for it
+    
+    Only used when INGEST_LAMBDA_ARN is configured; otherwise ingestion is
+    left to the bucket's S3 event notification.
+    
+    Args:
+        s3_key: S3 key of the uploaded document
+        lambda_client: Initialized Lambda client
+        config: Configuration dictionary
+        
+    Returns:
+        True if an ingestion request was queued
+    """
+    if lambda_client is None or not config.get('INGEST_LAMBDA_ARN'):
+        return False
+    
+    try:
+        lambda_client.invoke(
+            FunctionName=config['INGEST_LAMBDA_ARN'],
+            InvocationType='Event',
+            Payload=orjson.dumps({'s3_key': s3_key, 'bucket': config['S3_BUCKET']})
+        )
+        return True
+    except ClientError:
+        return False
+
+def warm_query_lambda(lambda_client, config: dict) -> bool:
+    """
+    Ping the Query Lambda so an instance is warm before the first question
+    
+    Only used when QUERY_WARMUP is enabled; the function must return
+    immediately for {"warmup": true} events. Provisioned concurrency on the query function removes cold starts
+    entirely and is the recommended production setting.
+    
+    Args:
+        lambda_client: Initialized Lambda client
+        config: Configuration dictionary
+        
+    Returns:
+        True if the warm-up request was queued
+    """
+    if lambda_client is None or not config.get('QUERY_WARMUP'):
+        return False
+    
+    try:
+        lambda_client.invoke(
+            FunctionName=config['QUERY_LAMBDA_ARN'],
+            InvocationType='Event',
+            Payload=orjson.dumps({'warmup': True})
+        )
+        return True
+    except ClientError:
+        return False
+
+def warm_s3_client(s3_client, config: dict) -> bool:
+    """
+    Make a cheap S3 call so the first upload finds a resolved endpoint and an open connection
+    
+    Args:
+        s3_client: Initialized S3 client
+        config: Configuration dictionary
+        
+    Returns:
+        True if the bucket answered
+    """
+    if s3_client is None:
+        return False
+    
+    try:
+        s3_client.head_bucket(Bucket=config['S3_BUCKET'])
+        return True
+    except ClientError:
+        return False
+
+class ReplyCache:
+    """Thread-safe TTL/LRU store of Query Lambda answers"""
+    
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        """Return a copy of a fresh cached answer, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, reply = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return {"response": reply["response"], "snippets": list(reply["snippets"])}
+    
+    def put(self, key: Tuple[str, str], reply: Dict[str, Any]) -> None:
+        """Store an answer, evicting the least recently used entries past max_entries"""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), {"response": reply["response"], "snippets": list(reply["snippets"])})
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def discard(self, key: Tuple[str, str]) -> None:
+        """Forget the answer for one question"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self) -> None:
+        """Forget every answer, e.g. once new documents change what the answers would be"""
+        with self._lock:
+            self._entries.clear()
+
+@st.cache_resource
+def _reply_cache() -> ReplyCache:
+    """Answers to recently asked questions, shared by all sessions for an hour"""
+    return ReplyCache(ttl=3600, max_entries=512)
+
+def _normalize_query(message: str) -> str:
+    """Fold case and whitespace so trivially different phrasings share a cache entry"""
+    return " ".join(message.lower().split())
+
+def _backoff(attempt: int) -> None:
+    """Sleep with exponential backoff plus jitter before the next retry"""
+    time.sleep((2 ** attempt) * 0.5 + random.random() * 0.25)
+
+def _event_stream_chunks(payload: bytes, lambda_client, config: dict) -> Iterator[bytes]:
+    """Yield the Query Lambda response bytes from an InvokeWithResponseStream call"""
+    response = lambda_client.invoke_with_response_stream(
+        FunctionName=config['QUERY_LAMBDA_ARN'],
+        Payload=payload
+    )
+    try:
+        for event in response['EventStream']:
+            if 'PayloadChunk' in event:
+                yield event['PayloadChunk']['Payload']
+            elif 'InvokeComplete' in event:
+                complete = event['InvokeComplete']
+                if complete.get('ErrorCode'):
+                    raise QueryFunctionError(complete.get('ErrorDetails') or complete['ErrorCode'])
+    except SocketReadTimeoutError as e:
+        # urllib3 raises this directly while the event stream body is read
+        raise ReadTimeoutError(endpoint_url=config['QUERY_LAMBDA_ARN']) from e
+
+def _function_url_chunks(payload: bytes, config: dict) -> Iterator[bytes]:
+    """Yield the Query Lambda response bytes from its RESPONSE_STREAM function URL"""
+    url = config['QUERY_FUNCTION_URL']
+    headers = {'Content-Type': 'application/json'}
+    
+    # Sign the request for IAM-authenticated URLs; URLs without auth ignore the headers
+    credentials = _aws_session(config['S3_REGION'], config['AWS_ACCESS_KEY_ID'], config['AWS_SECRET_ACCESS_KEY']).get_credentials()
+    if credentials is not None:
+        request = AWSRequest(method='POST', url=url, data=payload, headers=headers)
+        SigV4Auth(credentials.get_frozen_credentials(), 'lambda', config['S3_REGION']).add_auth(request)
+        headers = dict(request.headers)
+    
+    with get_http_session().post(url, data=payload, headers=headers, stream=True,
+                                 timeout=(config['CHAT_CONNECT_TIMEOUT'], config['CHAT_READ_TIMEOUT'])) as response:
+        if response.status_code == 429:
+            raise QueryFunctionError("throttled by the function URL (HTTP 429)", retryable=True)
+        elif response.status_code >= 500:
+            raise QueryFunctionError(f"function URL failure (HTTP {response.status_code})", retryable=True)
+        elif response.status_code in (401, 403):
+            raise QueryFunctionError(f"function URL rejected the AWS credentials (HTTP {response.status_code})",
+                                     credentials_rejected=True)
+        elif response.status_code >= 400:
+            raise QueryFunctionError(f"function URL rejected the request (HTTP {response.status_code})")
+        
+        try:
+            yield from response.iter_content(chunk_size=None)
+        except requests.exceptions.ConnectionError as e:
+            # requests wraps read timeouts on the body in ConnectionError
+            if e.args and isinstance(e.args[0], SocketReadTimeoutError):
+                raise requests.exceptions.ReadTimeout(*e.args) from e
+            raise
+
+def stream_chat_message(message: str, lambda_client, config: dict, reply: Dict[str, Any], max_retries: int = 2) -> Iterator[str]:
     """
-    Send chat message to Query Lambda with retry logic
+    Stream the Query Lambda answer with retry logic
+    
+    The answer is read from the function URL when QUERY_FUNCTION_URL is set,
+    otherwise through InvokeWithResponseStream. Plain-text payload chunks are
+    yielded as soon as they arrive so they can be rendered with
+    st.write_stream. A function that returns the usual JSON envelope is
+    buffered and its response yielded once complete.
     
     Args:
         message: User's question/message
         lambda_client: Initialized Lambda client
         config: Configuration dictionary
+        reply: Dictionary filled in place with the final response and snippets,
+            plus an 'error' flag when no proper answer could be produced and an
+            'aws_reset' flag when the cached AWS clients were dropped
         max_retries: Maximum number of retry attempts
         
-    Returns:
-        Response from the Query Lambda
+    Yields:
+        Response text chunks
     """
+    reply.setdefault("response", "")
+    reply.setdefault("snippets", [])
+    
+    def fail(text: str) -> str:
+        if reply["response"]:
+            # Keep the part of the answer that was already streamed to the user
+            text = f"\n\n{text}"
+            reply["response"] += text
+        else:
+            reply["response"] = text
+        reply["snippets"] = []
+        reply["error"] = True
+        return text
+    
     if lambda_client is None:
-        return {
-            "success": True,
-            "data": {
-                "response": "I'm not connected to AWS services right now. Please check your AWS credentials and region settings.",
-                "snippets": []
-            }
-        }
+        yield fail("I'm not connected to AWS services right now. Please check your AWS credentials and region settings.")
+        return
 
     for attempt in range(max_retries):
+        streaming = None
         try:
-            payload = {"query": message}
-            response = lambda_client.invoke(
-                FunctionName=config['QUERY_LAMBDA_ARN'],
-                InvocationType='RequestResponse',
-                Payload=json.dumps(payload)
-            )
-            response_body = json.loads(response['Payload'].read().decode('utf-8'))
+            payload = orjson.dumps({"query": message})
+            if config.get('QUERY_FUNCTION_URL'):
+                chunks = _function_url_chunks(payload, config)
+            else:
+                chunks = _event_stream_chunks(payload, lambda_client, config)
             
-            if 'statusCode' in response_body and response_body['statusCode'] == 200:
-                return {"success": True, "data": response_body['body']}
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            buffered = bytearray()
+            error_msg = None
+            retryable = False
+            try:
+                for chunk in chunks:
+                    if streaming is None and chunk.strip():
+                        # Plain text is streamed token by token, a JSON envelope is buffered
+                        streaming = not chunk.lstrip().startswith(b'{')
+                    if streaming:
+                        text = decoder.decode(chunk)
+                        if text:
+                            reply["response"] += text
+                            yield text
+                    else:
+                        buffered.extend(chunk)
+            except QueryFunctionError as e:
+                error_msg = str(e)
+                retryable = e.retryable
+                if e.credentials_rejected:
+                    # Signed with stale or bad credentials - rebuild them on the next run
+                    _reset_aws()
+                    reply["aws_reset"] = True
+            
+            if streaming:
+                text = decoder.decode(b'', final=True)
+                if error_msg:
+                    text += f"\n\nI encountered an error: {error_msg}."
+                    reply["error"] = True
+                if text:
+                    reply["response"] += text
+                    yield text
+                return
+            
+            if error_msg is None:
+                response_body = orjson.loads(buffered)
+                # Python handlers usually return the body as a JSON string
+                body = response_body.get('body', {})
+                body = orjson.loads(body) if isinstance(body, (str, bytes)) else body
+                if not isinstance(body, dict):
+                    body = {}
+                
+                if 'statusCode' in response_body and response_body['statusCode'] == 200:
+                    reply["response"] = body.get("response", "")
+                    reply["snippets"] = body.get("snippets") or []
+                    yield reply.get("response", "")
+                    return
+                
+                error_msg = str(body.get('error') or 'Unknown error')
+                # Errors returned in the function's own envelope only carry text
+                retryable = any(marker in error_msg.lower() for marker in ['timeout', 'throttle', 'temporary'])
             
             # Handle specific error cases that might be retryable
-            error_msg = response_body.get('body', {}).get('error', 'Unknown error')
-            if any(retryable in error_msg.lower() for retryable in ['timeout', 'throttle', 'temporary']):
+            if retryable:
                 if attempt < max_retries - 1:
-                    wait_time = (2 ** attempt) + 0.5  # Exponential backoff
-                    time.sleep(wait_time)
+                    _backoff(attempt)
                     continue
                     
             # Non-retryable error or max retries reached
-            return {
-                "success": True,
-                "data": {
-                    "response": f"I encountered an error: {error_msg}. Please try again or rephrase your question.",
-                    "snippets": []
-                }
-            }
+            yield fail(f"I encountered an error: {error_msg}. Please try again or rephrase your question.")
+            return
             
         except ClientError as e:
             error_message = str(e)
+            error_code = e.response.get('Error', {}).get('Code', '')
             
             # Handle specific AWS errors
-            if 'UnrecognizedClientException' in error_message:
-                return {
-                    "success": True,
-                    "data": {
-                        "response": "Invalid AWS credentials. Please check your AWS access key and secret key.",
-                        "snippets": []
-                    }
-                }
-            elif 'AccessDeniedException' in error_message:
-                return {
-                    "success": True,
-                    "data": {
-                        "response": "Access denied. Please check your AWS IAM permissions.",
-                        "snippets": []
-                    }
-                }
-            elif any(retryable in error_message.lower() for retryable in ['timeout', 'throttle', 'temporary']):
-                if attempt < max_retries - 1:
-                    wait_time = (2 ** attempt) + 0.5
-                    time.sleep(wait_time)
+            if error_code in LAMBDA_ERROR_MESSAGES:
+                if error_code == 'UnrecognizedClientException':
+                    _reset_aws()
+                    reply["aws_reset"] = True
+                yield fail(LAMBDA_ERROR_MESSAGES[error_code])
+                return
+            elif error_code in RETRYABLE_LAMBDA_ERRORS:
+                # Chunks already shown cannot be taken back, so only retry before streaming starts
+                if attempt < max_retries - 1 and not streaming:
+                    _backoff(attempt)
                     continue
             
-            return {
-                "success": True,
-                "data": {
-                    "response": f"AWS service error: {error_message}",
-                    "snippets": []
-                }
-            }
+            yield fail(f"AWS service error: {error_message}")
+            return
             
-        except json.JSONDecodeError:
-            return {
-                "success": True,
-                "data": {
-                    "response": "Received invalid response format. Please try again.",
-                    "snippets": []
-                }
-            }
+        except (json.JSONDecodeError, orjson.JSONDecodeError):
+            yield fail("Received invalid response format. Please try again.")
+            return
+        
+        except (requests.exceptions.ConnectTimeout, ConnectTimeoutError):
+            yield fail("Could not connect to the query service. Please check your network connection and try again.")
+            return
+        
+        except (requests.exceptions.ReadTimeout, ReadTimeoutError):
+            yield fail("The query service is taking too long to respond. Please try again in a moment.")
+            return
             
         except Exception as e:
-            if attempt < max_retries - 1:
-                wait_time = (2 ** attempt) + 0.5
-                time.sleep(wait_time)
+            if attempt < max_retries - 1 and not streaming:
+                _backoff(attempt)
                 continue
                 
-            return {
-                "success": True,
-                "data": {
-                    "response": f"An unexpected error occurred: {str(e)}",
-                    "snippets": []
-                }
-            }
+            yield fail(f"An unexpected error occurred: {str(e)}")
+            return
+    
+    yield fail("Request failed after multiple attempts. Please try again later.")
+
+def _snippets_html(snippets: List[Dict[str, Any]]) -> str:
+    """Build the document snippet block for an AI message"""
+    if not snippets:
+        return ""
+    
+    return SNIPPETS_HEADER + "".join(
+        SNIPPET_TMPL.format(source=html.escape(str(snippet.get("source") or "Unknown document")),
+                            text=html.escape(str(snippet.get("text") or "")))
+        for snippet in snippets
+    )
+
+def _message_markdown(message: Dict[str, Any]) -> str:
+    """Build the markdown of a chat message once, when it is added to the history"""
+    # Caption and body share one markdown element so each message is a single delta
+    is_user = message["type"] == "user"
+    caption = CAPTION_TMPL.format(author='You' if is_user else 'AI Assistant', timestamp=message.get('timestamp', ''))
+    if is_user:
+        # Keep the line breaks typed into the input box
+        content = message['content'].replace('\n', '  \n')
+    else:
+        content = message['content'].get('response') or 'No response received'
+    return MESSAGE_TMPL.format(caption=caption, content=content)
+
+def add_chat_message(message: Dict[str, Any]) -> None:
+    """Append a finished message to the chat history with its rendered body"""
+    message["_markdown"] = _message_markdown(message)
+    if message["type"] != "user":
+        message["_snippets_html"] = _snippets_html(message['content'].get('snippets', []))
+    st.session_state.chat_history.append(message)
+
+def render_chat_history():
+    """Render the conversation so far"""
+    if not st.session_state.chat_history:
+        st.info("👋 Start a conversation by asking a question about your documents!")
+        return
     
-    return {
-        "success": True,
-        "data": {
-            "response": "Request failed after multiple attempts. Please try again later.",
-            "snippets": []
+    for message in st.session_state.chat_history:
+        with st.chat_message("user" if message["type"] == "user" else "assistant"):
+            # Message text is escaped by Streamlit; only the snippet block is trusted HTML
+            st.markdown(message.get('_markdown') or _message_markdown(message))
+            if message.get('_snippets_html'):
+                st.markdown(message['_snippets_html'], unsafe_allow_html=True)
+
+def _last_question() -> Optional[str]:
+    """Most recent question the user asked in this conversation"""
+    for message in reversed(st.session_state.chat_history):
+        if message["type"] == "user":
+            return message["content"]
+    return None
+
+def _refresh_last_question():
+    """Queue the last question to be asked again without the cached answer"""
+    st.session_state.pending_question = _last_question()
+
+def _new_chat():
+    """Start an empty conversation"""
+    st.session_state.chat_history.clear()
+
+@st.fragment
+def chat_panel(lambda_client, config: dict, aws_connected: bool):
+    """Chat interface - reruns on its own when its widgets change, not the whole page"""
+    st.markdown("### 💬 Ask a Question")
+    
+    # Scrollable chatbox, filled in below once the input has been handled
+    chat_box = st.container(height=600)
+    
+    # Input section
+    prompt = st.chat_input(
+        "e.g., What are the safety guidelines for equipment maintenance?",
+        disabled=not aws_connected
+    )
+    
+    # Refresh and New Chat buttons
+    col_refresh, col_new_chat = st.columns([1, 1])
+    with col_refresh:
+        st.button("Refresh", disabled=not aws_connected or _last_question() is None,
+                  on_click=_refresh_last_question, help="Ask the last question again without using a cached answer")
+
+    with col_new_chat:
+        st.button("New Chat", on_click=_new_chat)
+    
+    # Handle a submitted question, or one queued by the Refresh callback
+    refresh = "pending_question" in st.session_state
+    question = st.session_state.pop("pending_question") if refresh else (prompt or "").strip()
+    sending = bool(question) and aws_connected
+    if sending:
+        # One timestamp for both sides of the turn
+        timestamp = time.strftime("%H:%M:%S")
+        cache_key = (_normalize_query(question), config['QUERY_LAMBDA_ARN'])
+        if refresh:
+            _reply_cache().discard(cache_key)
+        
+        # Add user message to history
+        user_message = {
+            "content": question,
+            "timestamp": timestamp,
+            "type": "user"
         }
-    }
+        add_chat_message(user_message)
+    
+    with chat_box:
+        render_chat_history()
+        
+        if sending:
+            ai_response = {
+                "content": _reply_cache().get(cache_key),
+                "timestamp": timestamp,
+                "type": "ai"
+            }
+            with st.chat_message("assistant"):
+                if ai_response["content"] is not None:
+                    st.markdown(ai_response["content"]["response"])
+                else:
+                    # Stream the Query Lambda response as it arrives
+                    ai_response["content"] = {"response": "", "snippets": []}
+                    st.write_stream(stream_chat_message(question, lambda_client, config, ai_response["content"]))
+                    if not ai_response["content"].get("error"):
+                        _reply_cache().put(cache_key, ai_response["content"])
+                snippets_html = _snippets_html(ai_response["content"].get("snippets", []))
+                if snippets_html:
+                    st.markdown(snippets_html, unsafe_allow_html=True)
+            aws_reset = ai_response["content"].pop("aws_reset", False)
+            add_chat_message(ai_response)
+            
+            # Fragment reruns reuse the old clients and sidebar, so rebuild the whole page
+            if aws_reset:
+                st.rerun(scope="app")
 
 def main():
     """Main application function"""
+    _inject_css()
     initialize_session_state()
     
     # Initialize AWS clients
     s3_client, lambda_client, config, aws_connected, aws_status = initialize_aws_clients()
     
+    # Warm the Query Lambda and the S3 connection once per browser session, off the script thread
+    if aws_connected and not st.session_state.get('warmed'):
+        if config['QUERY_WARMUP']:
+            _pool().submit(warm_query_lambda, lambda_client, config)
+        _pool().submit(warm_s3_client, s3_client, config)
+        st.session_state.warmed = True
+    
     # Show connection status in sidebar
     if aws_connected:
         st.sidebar.success(f"✅ {aws_status}")
     else:
         st.sidebar.error(f"❌ {aws_status}")
+    for warning in config['CONFIG_WARNINGS']:
+        st.sidebar.warning(f"⚠️ {warning}")
     
     # Header section
-    st.markdown('<h1 class="main-header">📚 Internal Document Search Chatbot</h1>', unsafe_allow_html=True)
-    st.markdown('<p class="sub-header">Upload your internal documents and ask questions using natural language</p>', unsafe_allow_html=True)
+    st.markdown(HEADER_HTML, unsafe_allow_html=True)
+    st.markdown(SUBHEADER_HTML, unsafe_allow_html=True)
     
     # Main layout with sidebar
     col1, col2 = st.columns([2, 1])
@@ -395,6 +986,39 @@ def main():
             help="Upload internal documents like guidelines, manuals, and policies"
         )
         
+        # Large files can skip this server entirely
+        if aws_connected:
+            with st.expander("🚀 Upload a large PDF directly to S3"):
+                st.caption("The file goes from your browser to S3 and is not shown in the viewer below. "
+                           "Once it has uploaded, click Register upload to check it and start ingestion.")
+                direct_upload_widget(s3_client, config)
+                
+                if st.button("📋 Register upload"):
+                    result = register_direct_uploads(s3_client, config, st.session_state.get('direct_upload_prefixes', []),
+                                                     st.session_state.uploaded_files)
+                    if not result["success"]:
+                        st.error(f"❌ {result['error']}")
+                    else:
+                        for upload in result["data"]["registered"]:
+                            st.session_state.uploaded_files[upload["s3_key"]] = {
+                                "name": upload["filename"],
+                                "size": upload["size"],
+                                "upload_time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                                "status": "processing",
+                                "s3_key": upload["s3_key"]
+                            }
+                            _pool().submit(trigger_ingestion, upload["s3_key"], lambda_client, config)
+                        
+                        for filename in result["data"]["rejected"]:
+                            st.error(f"❌ '{filename}' is not a valid PDF file and was removed.")
+                        if result["data"]["registered"]:
+                            # Cached answers predate these documents
+                            _reply_cache().clear()
+                            names = ", ".join(upload["filename"] for upload in result["data"]["registered"])
+                            st.success(f"✅ Registered {names} for ingestion.")
+                        elif not result["data"]["rejected"]:
+                            st.info("📝 No new direct uploads found.")
+        
         if uploaded_file is not None:
             # Display file info
             st.write(f"**File:** {uploaded_file.name}")
@@ -410,197 +1034,78 @@ def main():
                     
                     with progress_placeholder.container():
                         progress_bar = st.progress(0)
-                        status_placeholder.text("Preparing file for upload...")
-                        time.sleep(0.5)
-                        progress_bar.progress(25)
-                        
-                        # Upload file
-                        file_content = uploaded_file.read()
                         status_placeholder.text("Uploading to S3...")
-                        result = upload_file_to_s3(file_content, uploaded_file.name, s3_client, config)
-                        progress_bar.progress(50)
                         
-                        if result["success"]:
-                            status_placeholder.text("Processing document...")
-                            progress_bar.progress(75)
-                            
+                        # S3 transfer threads report bytes sent; only the script thread may redraw the bar
+                        transferred = [0]
+                        transferred_lock = threading.Lock()
+                        
+                        def on_bytes(bytes_amount: int):
+                            with transferred_lock:
+                                transferred[0] += bytes_amount
+                        
+                        # The same bytes already uploaded this session are not sent again
+                        digest = _content_digest(uploaded_file)
+                        result = st.session_state.upload_status.get(digest)
+                        if result is None or not result["success"]:
+                            # Upload on a worker thread so the progress keeps updating while it runs
+                            future = _pool().submit(upload_file_to_s3, uploaded_file, uploaded_file.name,
+                                                    s3_client, config, on_bytes, digest)
+                            while True:
+                                progress_bar.progress(min(100, int(100 * transferred[0] / max(uploaded_file.size, 1))))
+                                try:
+                                    result = future.result(timeout=0.25)
+                                    break
+                                except concurrent.futures.TimeoutError:
+                                    continue
+                            st.session_state.upload_status[digest] = result
+                        
+                        if result["success"] and result["data"]["s3_key"] in st.session_state.uploaded_files:
+                            progress_bar.progress(100)
+                            status_placeholder.text("Document ready!")
+                            st.info("📝 This document was already uploaded in this session.")
+                        elif result["success"]:
                             # Add to session state
-                            st.session_state.uploaded_files.append({
+                            st.session_state.uploaded_files[result["data"]["s3_key"]] = {
                                 "name": uploaded_file.name,
                                 "size": uploaded_file.size,
-                                "upload_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                                "upload_time": time.strftime("%Y-%m-%d %H:%M:%S"),
                                 "status": "processing",
                                 "s3_key": result["data"]["s3_key"]
-                            })
+                            }
                             
-                            # Wait briefly to simulate processing time and allow ingestion lambda to start
-                            time.sleep(2)
+                            # Kick off ingestion without waiting for it to finish
+                            if not result["data"]["existing"]:
+                                _pool().submit(trigger_ingestion, result["data"]["s3_key"], lambda_client, config)
+                                # Cached answers predate this document
+                                _reply_cache().clear()
                             progress_bar.progress(100)
                             status_placeholder.text("Document ready!")
                             
                             st.success("✅ Document uploaded and processed successfully!")
                             st.info("📝 You can now ask questions about this document.")
-                            
-                            # Update final status
-                            st.session_state.upload_status[uploaded_file.name] = "success"
                         else:
-                            st.session_state.upload_status[uploaded_file.name] = "error"
                             st.error(f"❌ Upload failed: {result['error']}")
         
         # PDF Viewer section (simplified for deployment)
         if uploaded_file is not None:
             st.markdown("### 📄 PDF Viewer")
-            uploaded_file.seek(0)
-            pdf_bytes = uploaded_file.read()
             st.info(f"📄 **{uploaded_file.name}** - {uploaded_file.size:,} bytes")
             
             # Simple download option
             st.download_button(
                 label="📥 Download PDF",
-                data=pdf_bytes,
+                data=uploaded_file.getvalue(),
                 file_name=uploaded_file.name,
                 mime="application/pdf"
             )
     
     with col2:
-        # Chat interface
-        st.markdown("### 💬 Ask a Question")
-        
-        # Unified scrollable chatbox
-        st.markdown('<div class="unified-chat-container">', unsafe_allow_html=True)
-        
-        if not st.session_state.chat_history:
-            st.info("👋 Start a conversation by asking a question about your documents!")
-        else:
-            for message in st.session_state.chat_history:
-                if message["type"] == "user":
-                    st.markdown(f"""
-                    <div class="chat-message user-message">
-                        <div class="message-timestamp">You • {message.get('timestamp', '')}</div>
-                        <strong>{message['content']}</strong>
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    # AI message with snippets
-                    try:
-                        if isinstance(message['content'], str) and message['content'].strip().startswith('{'):
-                            response_data = json.loads(message['content'])
-                        else:
-                            response_data = message['content'] if isinstance(message['content'], dict) else {'response': message['content']}
-
-                        response_text = response_data.get('response', 'No response received')
-                        snippets = response_data.get('snippets', [])
-
-                        st.markdown(f"""
-                        <div class="chat-message ai-message">
-                            <div class="message-timestamp">AI Assistant • {message.get('timestamp', '')}</div>
-                            <strong>{response_text}</strong>
-                        </div>
-                        """, unsafe_allow_html=True)
-
-                        # Display document snippets if available
-                        if snippets:
-                            st.markdown("**📄 Relevant Document Snippets:**")
-                            for snippet in snippets:
-                                st.markdown(f"""
-                                <div class="document-snippet">
-                                    <strong>From:</strong> {snippet.get('source', 'Unknown document')}<br>
-                                    {snippet.get('text', '')}
-                                </div>
-                                """, unsafe_allow_html=True)
-                    except json.JSONDecodeError:
-                        st.markdown(f"""
-                        <div class="chat-message ai-message">
-                            <div class="message-timestamp">AI Assistant • {message.get('timestamp', '')}</div>
-                            <strong>{message['content']}</strong>
-                        </div>
-                        """, unsafe_allow_html=True)
-
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Input section
-        user_input = st.text_area(
-            "Ask a question about your documents:",
-            height=80,
-            placeholder="e.g., What are the safety guidelines for equipment maintenance?",
-            key="user_input",
-            label_visibility="collapsed"
-        )
-        
-        # Send and New Chat buttons
-        col_send, col_new_chat = st.columns([1, 1])
-        with col_send:
-            send_button = st.button("Send", type="primary", disabled=not user_input.strip() or not aws_connected)
-
-        with col_new_chat:
-            new_chat_button = st.button("New Chat")
-
-        # Handle new chat button
-        if new_chat_button:
-            st.session_state.chat_history = []
-            st.rerun()
-        
-        # Handle send button
-        if send_button and user_input.strip() and aws_connected:
-            # Add user message to history
-            user_message = {
-                "content": user_input,
-                "timestamp": datetime.now().strftime("%H:%M:%S"),
-                "type": "user"
-            }
-            st.session_state.chat_history.append(user_message)
-            
-            # Send to Query Lambda and get response
-            with st.spinner("🔍 Searching through documents..."):
-                result = send_chat_message(user_input, lambda_client, config)
-                
-                if result["success"]:
-                    try:
-                        if isinstance(result["data"], str):
-                            response_data = json.loads(result["data"])
-                        else:
-                            response_data = result["data"]
-                            
-                        ai_response = {
-                            "content": result["data"],
-                            "timestamp": datetime.now().strftime("%H:%M:%S"),
-                            "type": "ai"
-                        }
-                        st.session_state.chat_history.append(ai_response)
-                    except json.JSONDecodeError:
-                        error_response = {
-                            "content": {
-                                "response": "I received an invalid response format. Please try asking your question again.",
-                                "snippets": []
-                            },
-                            "timestamp": datetime.now().strftime("%H:%M:%S"),
-                            "type": "ai"
-                        }
-                        st.session_state.chat_history.append(error_response)
-                else:
-                    error_response = {
-                        "content": {
-                            "response": f"Sorry, I encountered an error: {result.get('error', 'Unknown error')}",
-                            "snippets": []
-                        },
-                        "timestamp": datetime.now().strftime("%H:%M:%S"),
-                        "type": "ai"
-                    }
-                    st.session_state.chat_history.append(error_response)
-            
-            st.rerun()
-    
+        chat_panel(lambda_client, config, aws_connected)
+
     # Footer
     st.markdown("---")
-    st.markdown(
-        """
-        <div style='text-align: center; color: #666; padding: 1rem;'>
-            <p>🔧 Internal Document Search Chatbot | Built with Streamlit</p>
-            <p>For manufacturing employees to easily search guidelines, manuals, and policies</p>
-        </div>
-        """, 
-        unsafe_allow_html=True
-    )
+    st.markdown(FOOTER_HTML, unsafe_allow_html=True)
 
 if __name__ == "__main__":
     main()